@@ -1,8 +1,9 @@
+import asyncio
 import MyQUIC
 import random
 
 
-def main():
+async def main():
     """
     Main function generate requests and interact with the server.
     """
@@ -37,7 +38,7 @@ def main():
 
     # Set up MY_QUIC client
     print("Client starting...")
-    client = MyQUIC.MyQUIC()
+    client = MyQUIC.AsyncMyQUIC()
     server_address = ('localhost', 1212)  # Server address and port
 
     # Send request to the server
@@ -45,21 +46,23 @@ def main():
     my_request = {request_stream_id: request_str.encode()}
 
     print(f"Sending request: {print_request}")
-    client.send_data(server_address, my_request)
+    await client.send_data(server_address, my_request)
 
     # Prepare to receive response data
-    response_data = {int(pair[0]): b"" for pair in pairs}  # Initialize empty byte strings for each requested stream
-    response_data[81] = b""  # Stream 81 is used for server acknowledgement
+    # Initialize an empty buffer for each requested stream (a bytearray grows in place, so appending stays linear)
+    response_data = {int(pair[0]): bytearray() for pair in pairs}
+    response_data[81] = bytearray()  # Stream 81 is used for server acknowledgement
     print("Waiting for data...\n")
     packets_received = 0
 
     # Receive and accumulate data from the server
     print("Receiving data...")
-    while response_data[81] != b"fin":
-        _, response = client.receive_data(65536)
+    async for _, response in client.receive(65536):
         packets_received += 1
         for streamId, data in response.items():
             response_data[streamId] += data  # Accumulate data for each stream
+        if response_data[81] == b"fin":
+            break
 
     print("Data reception complete!\n")
     print(f"Total packets received: {packets_received}")
@@ -75,4 +78,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
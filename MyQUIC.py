@@ -1,10 +1,17 @@
 import socket
 
 from typing import List
+from collections import deque
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import os
 import random
+import select
 import struct
+import sys
 import time
-import math
 
 MAX_RECEIVE_BYTES = 65536
 SHORT_PACKET = 3
@@ -15,10 +22,52 @@ ACK_TIMEOUT = 2
 MAX_FRAMES_FOR_PACKET = 6
 MAX_STREAM_SIZE = 2000
 MIN_STREAM_SIZE = 1000
+SOCKET_BUFFER_SIZE = 8 * 1024 * 1024  # Kernel send/receive buffer size, large enough to absorb bursts
+SEND_WINDOW = 8  # Maximum number of unacknowledged packets in flight
+MAX_RETRIES = 3  # Number of consecutive ACK timeouts (each followed by a resend) before giving up
+RECEIVE_BATCH = 32  # Maximum number of packets taken from the socket in a single batch
+RECEIVE_POLL = 0.1  # Seconds an asynchronous receive waits on the socket at a time, before letting other calls run
+_MSG_WAITFORONE = 0x10000  # recvmmsg flag: block for the first message only (not exposed by the socket module)
+
+
+class _IoVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p), ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.c_void_p), ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p), ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+class _SockAddrIn(ctypes.Structure):
+    _fields_ = [("sin_family", ctypes.c_ushort), ("sin_port", ctypes.c_uint16),
+                ("sin_addr", ctypes.c_uint8 * 4), ("sin_zero", ctypes.c_uint8 * 8)]
+
+
+# sendmmsg(2)/recvmmsg(2) move a whole batch of packets in a single system call; they only exist on Linux
+_libc = None
+if sys.platform.startswith("linux"):
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        _libc.sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+        _libc.recvmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    except (OSError, AttributeError):
+        _libc = None
 
 
 class PacketHeader:
     HEADER_FORMAT = "!BI"  # Format for packing/unpacking the header: unsigned char, unsigned int
+    # Precompiled so the format isn't re-parsed per packet. On CPython this also beats building the 5 bytes
+    # by hand with int.to_bytes/int.from_bytes (roughly 1.5-3x faster for both pack and unpack)
+    HEADER_STRUCT = struct.Struct(HEADER_FORMAT)
+    SIZE = HEADER_STRUCT.size  # Serialized header size in bytes
+    __slots__ = ("type", "number")
 
     def __init__(self, packet_type: int, packet_number: int):
         self.type = packet_type
@@ -31,7 +80,7 @@ class PacketHeader:
         Returns:
             bytes: Serialized header.
         """
-        return struct.pack(self.HEADER_FORMAT, self.type, self.number)
+        return self.HEADER_STRUCT.pack(self.type, self.number)
 
     @classmethod
     def deserialize(cls, data: bytes) -> 'PacketHeader':
@@ -44,8 +93,7 @@ class PacketHeader:
         Returns:
             PacketHeader: Deserialized PacketHeader instance.
         """
-        packet_type, packet_number = struct.unpack(cls.HEADER_FORMAT, data)
-        return cls(packet_type, packet_number)
+        return cls(*cls.HEADER_STRUCT.unpack(data))
 
 
 class Frame:
@@ -53,6 +101,9 @@ class Frame:
     Represents a frame in a packet.
     """
     FRAME_FORMAT = "!IIQI"  # Format for packing/unpacking the frame: 3 unsigned ints, 1 unsigned long long
+    FRAME_STRUCT = struct.Struct(FRAME_FORMAT)  # Precompiled so the format isn't re-parsed per frame
+    SIZE = FRAME_STRUCT.size  # Serialized frame size in bytes
+    __slots__ = ("streamId", "type", "offset", "length")  # Fixed fields: no per-frame __dict__, faster attribute access
 
     def __init__(self, stream_id: int, frame_type: int, offset: int, length: int):
         self.streamId = stream_id
@@ -85,7 +136,7 @@ class Frame:
         Returns:
             bytes: Serialized frame.
         """
-        return struct.pack(self.FRAME_FORMAT, self.streamId, self.type, self.offset, self.length)
+        return self.FRAME_STRUCT.pack(self.streamId, self.type, self.offset, self.length)
 
     @classmethod
     def deserialize(cls, data: bytes) -> 'Frame':
@@ -98,8 +149,7 @@ class Frame:
         Returns:
             Frame: Deserialized Frame instance.
         """
-        stream_id, frame_type, offset, length = struct.unpack(cls.FRAME_FORMAT, data)
-        return cls(stream_id, frame_type, offset, length)
+        return cls(*cls.FRAME_STRUCT.unpack(data))
 
 
 class MyQUIC:
@@ -109,13 +159,35 @@ class MyQUIC:
     def __init__(self):
         # Initialize UDP socket for communication
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        # Calculate sizes of header and frame for later use in serialization/deserialization
-        self.header_size = len(PacketHeader(SHORT_PACKET, 2).serialize())
-        self.frame_size = len(Frame(5, DATA_FRAME, 6, 7).serialize())
+        # Enlarge the kernel buffers so bursts aren't dropped (the kernel may cap these at rmem_max/wmem_max)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        # Sizes of header and frame for later use in serialization/deserialization
+        self.header_size = PacketHeader.SIZE
+        self.frame_size = Frame.SIZE
         self.sent_packets = 0
         self.received_packets = 0
-        self.stream_bytes_received = {}
+        self.stream_bytes_received = {}  # Per-peer received bytes of each stream, keyed by peer address
         self.stream_bytes_sent = {}
+        # Send and receive buffers, allocated once and reused for every packet
+        max_packet_size = self.header_size + MAX_FRAMES_FOR_PACKET * (self.frame_size + MAX_STREAM_SIZE)
+        self._send_buffers = [bytearray(max_packet_size) for _ in range(SEND_WINDOW)]
+        self._send_views = [memoryview(buffer) for buffer in self._send_buffers]
+        if _libc is not None:
+            # sendmmsg message headers, each pointing at its own send buffer
+            self._send_iovecs = (_IoVec * SEND_WINDOW)(*[_IoVec(ctypes.addressof((ctypes.c_char * len(buffer)).from_buffer(buffer)),
+                                                                len(buffer)) for buffer in self._send_buffers])
+            self._send_headers = (_MMsgHdr * SEND_WINDOW)()
+            for i in range(SEND_WINDOW):
+                self._send_headers[i].msg_hdr.msg_iov = ctypes.addressof(self._send_iovecs[i])
+                self._send_headers[i].msg_hdr.msg_iovlen = 1
+        self._receive_buffer = bytearray(MAX_RECEIVE_BYTES)
+        self._receive_view = memoryview(self._receive_buffer)
+        self._sockaddrs = {}  # Resolved sockaddr_in structures for batched sends, keyed by address
+        self._ack_structs = {}  # Compiled ACK packet formats, keyed by number of ACK frame fields
+        self._recv_headers = None  # recvmmsg message headers and buffers, allocated on the first batch receive
+        self._pending_packets = deque()  # Data packets received while waiting for ACKs, not yet processed
+        self._rng = random.Random()  # Picks stream sizes and the streams of each packet
 
     def bind(self, server_address):
         self.socket.bind(server_address)
@@ -127,19 +199,19 @@ class MyQUIC:
 
         stream_sizes = {}  # Dictionary to store sizes of each stream
         frames = []  # List to store all frames
-        frames_to_send = []  # List of frames that need to be sent
+        frames_to_send = {}  # Frames that still need to be sent, keyed by stream ID
         streams_durations = {}  # Dictionary to track duration of each stream transmission
         max_stream_time = 0  # Variable to store the longest stream transmission time
 
         # Create frames for each stream in the input data
         for stream_id, data in data_dict.items():
             # Randomly determine stream size within defined limits
-            stream_size = random.randint(MIN_STREAM_SIZE, MAX_STREAM_SIZE)
+            stream_size = self._rng.randint(MIN_STREAM_SIZE, MAX_STREAM_SIZE)
             stream_sizes[stream_id] = stream_size
             # Create a new frame for this stream
             frame = Frame(stream_id, DATA_FRAME, 0, stream_size)
             frames.append(frame)
-            frames_to_send.append(frame)
+            frames_to_send[stream_id] = frame
             # Initialize sent bytes count for this stream if not already present
             if stream_id not in self.stream_bytes_sent:
                 self.stream_bytes_sent[stream_id] = 0
@@ -148,161 +220,479 @@ class MyQUIC:
         total_bytes_sent_udp = 0  # Total bytes sent over UDP
         total_bytes_sent_data = 0  # Total data bytes sent (excluding headers and metadata)
 
+        # Views of the input data, so stream slices are copied only once, straight into the packet buffer
+        data_views = {stream_id: memoryview(data) for stream_id, data in data_dict.items()}
+        stream_lengths = {stream_id: len(data) for stream_id, data in data_dict.items()}  # Loop-invariant lengths
+        send_offsets = {stream_id: 0 for stream_id in frames_to_send}  # Next byte of each stream to put in a packet
+        # Streams that still have data left for another packet, kept up to date instead of rebuilt for every packet
+        sendable_ids = [stream_id for stream_id, length in stream_lengths.items() if length > 0]
+        # Bind what the packet loops use on every frame to locals, sparing the attribute lookups
+        header_size, frame_size = self.header_size, self.frame_size
+        pack_header, pack_frame = PacketHeader.HEADER_STRUCT.pack_into, Frame.FRAME_STRUCT.pack_into
+        unpack_header = PacketHeader.HEADER_STRUCT.unpack_from  # Headers are read straight into locals, no object
+        unpack_frame = Frame.FRAME_STRUCT.unpack_from  # ACK frames are read into locals as well
+        sample = self._rng.sample
+        in_flight = {}  # Send time of every unacknowledged packet, keyed by packet number (in sending order)
+        timeouts = 0  # Number of consecutive ACK timeouts
+        # Streams whose data has been fully acknowledged, removed at the top of the loop (empty streams are done at once)
+        done_ids = [stream_id for stream_id, length in stream_lengths.items() if length == 0]
+
+        def go_back():
+            """
+            Resend from the acknowledged offsets: every stream with unacknowledged data becomes sendable again.
+            """
+            send_offsets.update((stream_id, frame.offset) for stream_id, frame in frames_to_send.items())
+            sendable_ids[:] = [stream_id for stream_id, frame in frames_to_send.items() if frame.offset < stream_lengths[stream_id]]
+
+        # Put the socket in timeout mode once; each ACK wait below passes its own deadline to _recv_batch
+        self.socket.settimeout(ACK_TIMEOUT)
         while frames_to_send:
-            packet_payload = b""  # Initialize empty payload for this packet
-            streams_to_send = []  # List of stream IDs to include in this packet
-
-            # Determine which streams to include in this packet
-            if len(frames_to_send) <= MAX_FRAMES_FOR_PACKET:
-                streams_to_send = [frame.streamId for frame in frames_to_send]
-            else:
-                # Randomly select streams if we have more than the maximum allowed per packet
-                streams_to_send = random.sample([frame.streamId for frame in frames_to_send], MAX_FRAMES_FOR_PACKET)
-
-            # Prepare data for each selected stream
-            for frame in frames_to_send[:]:
-                if frame.streamId not in streams_to_send:
-                    continue
-
-                # Calculate how many bytes to send for this stream in this packet
-                bytes_to_send = min(stream_sizes[frame.streamId], len(data_dict[frame.streamId]) - frame.offset)
-                if bytes_to_send == 0:
-                    # If no more data to send for this stream, remove it from the list
-                    frames_to_send.remove(frame)
+            # Remove streams whose data has been fully acknowledged
+            if done_ids:
+                now = time.perf_counter()  # One clock read for every stream finished by the same ACKs
+                for stream_id in done_ids:
+                    del frames_to_send[stream_id]
+                    # A late ACK may finish a stream that a go-back made sendable again
+                    if stream_id in sendable_ids:
+                        sendable_ids.remove(stream_id)
                     # Calculate the duration of this stream's transmission
-                    streams_durations[frame.streamId] = time.perf_counter() - streams_durations[frame.streamId]
-                    max_stream_time = streams_durations[frame.streamId]
-                    continue
-
-                # Extract the data for this frame
-                stream_data = data_dict[frame.streamId][frame.offset:frame.offset + bytes_to_send]
-                frame.update_length(bytes_to_send)
-                # Add this frame's data to the packet payload
-                packet_payload += frame.serialize() + stream_data
+                    streams_durations[stream_id] = now - streams_durations[stream_id]
+                    max_stream_time = streams_durations[stream_id]
+                done_ids.clear()
 
             if not frames_to_send:
                 break  # Exit if all frames have been sent
 
-            # Create packet header
-            packet_header = PacketHeader(SHORT_PACKET, self.sent_packets)
-            self.sent_packets += 1
-            packet_to_send = packet_header.serialize() + packet_payload
-
-            # Record start time for the first packet of each stream
-            if total_bytes_sent_udp == 0:
-                for frame in frames:
-                    streams_durations[frame.streamId] = time.perf_counter()
+            # Fill the send window: build packets until SEND_WINDOW packets are in flight
+            packet_sizes = []  # Sizes of the new packets (one per send buffer), sent together in a single batch
+            packet_numbers = []  # Numbers of the new packets, in sending order
 
-            # Attempt to send the packet and wait for acknowledgment
-            total_bytes_sent_udp += self.socket.sendto(packet_to_send, address)
+            while sendable_ids and len(in_flight) + len(packet_sizes) < SEND_WINDOW:
+                # Determine which streams to include in this packet
+                if len(sendable_ids) <= MAX_FRAMES_FOR_PACKET:
+                    streams_in_packet = sendable_ids[:]  # A copy, since finished streams are removed below
+                else:
+                    # Randomly select streams if we have more than the maximum allowed per packet
+                    streams_in_packet = sample(sendable_ids, MAX_FRAMES_FOR_PACKET)
+
+                # Reuse a preallocated buffer large enough for the header and every selected frame
+                packet_to_send = self._send_buffers[len(packet_sizes)]
+                pointer = header_size  # The header is written last, once the frames are in place
+
+                # Prepare data for each selected stream
+                for stream_id in streams_in_packet:
+                    offset = send_offsets[stream_id]
+                    # Calculate how many bytes to send for this stream in this packet (offsets need not fall on a
+                    # frame boundary: the receiver may acknowledge from where an earlier transfer on the stream ended)
+                    bytes_to_send = min(stream_sizes[stream_id], stream_lengths[stream_id] - offset)
+
+                    # Write the frame header straight into the packet buffer, followed by its data
+                    pack_frame(packet_to_send, pointer, stream_id, DATA_FRAME, offset, bytes_to_send)
+                    pointer += frame_size
+                    packet_to_send[pointer:pointer + bytes_to_send] = data_views[stream_id][offset:offset + bytes_to_send]
+                    pointer += bytes_to_send
+                    send_offsets[stream_id] = offset + bytes_to_send
+                    if offset + bytes_to_send >= stream_lengths[stream_id]:
+                        sendable_ids.remove(stream_id)  # All of its data is now in flight
+
+                # Write the packet header; only the used part of the buffer is sent
+                packet_number = self.sent_packets
+                self.sent_packets += 1
+                pack_header(packet_to_send, 0, SHORT_PACKET, packet_number)
+                packet_sizes.append(pointer)
+                packet_numbers.append(packet_number)
+
+            if packet_sizes:
+                # Record start time for the first packet of each stream
+                if total_bytes_sent_udp == 0:
+                    now = time.perf_counter()
+                    for frame in frames:
+                        streams_durations[frame.streamId] = now
+
+                # Send the new packets at once; they stay in flight until acknowledged
+                total_bytes_sent_udp += self._send_batch(packet_sizes, address)
+                send_time = time.perf_counter()
+                for packet_number in packet_numbers:
+                    in_flight[packet_number] = send_time
+
+            if not in_flight:
+                # Data is still unacknowledged but nothing is in flight: send it again from the acknowledged offsets
+                # (finished streams are gone by now and ACK offsets never pass the data, so there is always some left)
+                go_back()
+                continue
 
             try:
-                # Wait for acknowledgment with a timeout
-                self.socket.settimeout(ACK_TIMEOUT)
-                received_data, ack_address = self.socket.recvfrom(MAX_RECEIVE_BYTES)
+                # Wait for the next acknowledgments, until the oldest packet in flight times out, and take
+                # every ACK that is already waiting in one go
+                oldest_send_time = next(iter(in_flight.values()))
+                acks = self._recv_batch(timeout=max(oldest_send_time + ACK_TIMEOUT - time.perf_counter(), 0.001))
             except socket.timeout:
-                print(f"MyQUIC: No response from receiver (address: {address})")
-                break
-
-            # Process received acknowledgment
-            received_header = PacketHeader.deserialize(received_data[:self.header_size])
-            pointer = self.header_size
-
-            # Verify if the received ACK matches the sent packet
-            if received_header.number != packet_header.number or received_header.type != ACK_FRAME:
-                print(f"MyQUIC: No response from receiver (address: {address})")
-                break
-
-            # Process each frame in the ACK
-            while len(received_data) - pointer >= self.frame_size:
-                ack_frame = Frame.deserialize(received_data[pointer:pointer + self.frame_size])
-                pointer += self.frame_size
+                timeouts += 1
+                if timeouts > MAX_RETRIES:
+                    print(f"MyQUIC: No response from receiver (address: {address})")
+                    break
+                # Go back and resend everything that wasn't acknowledged
+                in_flight.clear()
+                go_back()
+                continue
+
+            packets_lost = False
+            for sender_address, received_data in acks:
+                # Process received acknowledgment
+                ack_type, ack_number = unpack_header(received_data, 0)
+                pointer = header_size
+
+                if ack_type != ACK_FRAME:
+                    # A data packet arrived with the ACKs (the peer may start sending right after its ACK):
+                    # keep a copy for the next receive instead of dropping it
+                    self._pending_packets.append((sender_address, bytearray(received_data)))
+                    continue
 
-                if ack_frame.type == ACK_FRAME:
-                    for sentFrame in frames_to_send:
-                        if sentFrame.streamId == ack_frame.streamId:
+                # Ignore anything that doesn't acknowledge a packet in flight (e.g. late ACKs of resent packets)
+                if ack_number not in in_flight:
+                    continue
+                timeouts = 0
+
+                # Packets sent before the acknowledged one that are still in flight were lost
+                packets_lost = packets_lost or ack_number != next(iter(in_flight))
+                for packet_number in list(in_flight):
+                    if packet_number > ack_number:
+                        break
+                    del in_flight[packet_number]
+
+                # Process each frame in the ACK
+                received_length = len(received_data)
+                while received_length - pointer >= frame_size:
+                    ack_stream_id, _, ack_offset, ack_length = unpack_frame(received_data, pointer)
+                    pointer += frame_size
+
+                    # Every frame of an ACK packet is an ACK frame (checked once, on the packet type, above)
+                    sentFrame = frames_to_send.get(ack_stream_id)
+                    if sentFrame is not None:
+                        # The receiver may acknowledge past the end of the data (when it continues the stream from
+                        # an earlier, longer transfer); count that as the whole stream acknowledged
+                        ack_offset = min(ack_offset, stream_lengths[ack_stream_id])
+                        if ack_offset > sentFrame.offset:
                             # Update the offset for successfully sent data
-                            sentFrame.offset = ack_frame.offset
-                            self.stream_bytes_sent[sentFrame.streamId] += sentFrame.length
+                            self.stream_bytes_sent[ack_stream_id] += ack_offset - sentFrame.offset
+                            sentFrame.offset = ack_offset
+                            if ack_offset >= stream_lengths[ack_stream_id]:
+                                done_ids.append(ack_stream_id)
+
+                    pointer += ack_length
 
-                pointer += ack_frame.length
+            if packets_lost:
+                # Go back and resend from the acknowledged offsets (the receiver drops out of order data)
+                go_back()
 
         self.socket.settimeout(None)  # Reset socket timeout
 
         # Print statistics if significant data was sent
         if frames[0].offset > 50:
-            print("\nSTATISTICS:")
-            print("\nStreams details:")
+            # Build the whole report first and write it out at once
+            lines = ["", "STATISTICS:", "", "Streams details:"]
             for flow in frames:
                 stream_id = flow.streamId
                 stream_size = stream_sizes[stream_id]
                 total_bytes = flow.offset
                 total_bytes_sent_data += total_bytes
-                stream_frames = math.ceil(total_bytes // stream_size)
-                print(f"Stream: {stream_id+1}, Size: {stream_size} bytes, Sent: {total_bytes} bytes, Sent in {stream_frames} different packets, "
-                      f"Pace: {(total_bytes/streams_durations[stream_id]):.2f} B/s, "
-                      f"{(stream_frames/streams_durations[stream_id]):.2f} Packets/s")
+                stream_frames = -(-total_bytes // stream_size)  # Integer ceiling division
+                lines.append(f"Stream: {stream_id+1}, Size: {stream_size} bytes, Sent: {total_bytes} bytes, Sent in {stream_frames} different packets, "
+                             f"Pace: {(total_bytes/streams_durations[stream_id]):.2f} B/s, "
+                             f"{(stream_frames/streams_durations[stream_id]):.2f} Packets/s")
 
-            print("\nGeneral details:")
-            print(f"Data pace: {(total_bytes_sent_data/max_stream_time):.2f} B/s, {(self.sent_packets / max_stream_time):.2f} Packets/s")
-            print("\n")
+            lines += ["", "General details:",
+                      f"Data pace: {(total_bytes_sent_data/max_stream_time):.2f} B/s, {(self.sent_packets / max_stream_time):.2f} Packets/s",
+                      "", "", ""]
+            sys.stdout.write("\n".join(lines))
 
         return total_bytes_sent_data
 
+    def _send_batch(self, packet_sizes: List[int], address) -> int:
+        """
+        Send the first packets of the send buffers to the same address, using a single sendmmsg(2) call
+        where it is available.
+
+        Args:
+            packet_sizes (List[int]): Size of the packet in each send buffer, in sending order.
+            address: Destination (host, port) address.
+
+        Returns:
+            int: Total number of bytes sent.
+        """
+        if _libc is None or len(packet_sizes) == 1:
+            return sum(self.socket.sendto(self._send_views[i][:size], address) for i, size in enumerate(packet_sizes))
+
+        # Resolve the destination once per address and keep it as a sockaddr_in structure
+        sockaddr = self._sockaddrs.get(address)
+        if sockaddr is None:
+            host, port = address
+            sockaddr = _SockAddrIn(socket.AF_INET, socket.htons(port),
+                                   (ctypes.c_uint8 * 4).from_buffer_copy(socket.inet_aton(socket.gethostbyname(host))))
+            self._sockaddrs[address] = sockaddr
+
+        # The message headers already point at the send buffers; only the sizes and destination change
+        count = len(packet_sizes)
+        headers = self._send_headers
+        for i, size in enumerate(packet_sizes):
+            self._send_iovecs[i].iov_len = size
+            headers[i].msg_hdr.msg_name = ctypes.addressof(sockaddr)
+            headers[i].msg_hdr.msg_namelen = ctypes.sizeof(sockaddr)
+
+        # sendmmsg may send only part of the batch, so keep going until every packet is out
+        sent = 0
+        while sent < count:
+            result = _libc.sendmmsg(self.socket.fileno(), ctypes.addressof(headers[sent]), count - sent, 0)
+            if result < 0:
+                error = ctypes.get_errno()
+                if error in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    # The socket is non-blocking while a timeout is set; wait until it is writable again
+                    select.select([], [self.socket], [])
+                    continue
+                raise OSError(error, os.strerror(error))
+            sent += result
+
+        return sum(headers[i].msg_len for i in range(count))
+
     def receive_data(self, max_bytes: int = MAX_RECEIVE_BYTES):
         """
         Receive data and send acknowledgment.
         """
-        # Receive data
-        received_data, sender_address = self.socket.recvfrom(MAX_RECEIVE_BYTES)
+        if self._pending_packets:
+            # A packet that arrived while waiting for ACKs comes first
+            sender_address, received_data = self._pending_packets.popleft()
+        else:
+            # Receive data into the reused receive buffer
+            received_bytes, sender_address = self.socket.recvfrom_into(self._receive_buffer)
+            received_data = self._receive_view[:received_bytes]
+        return sender_address, self._process_packet(received_data, sender_address, max_bytes)
+
+    def receive_data_batch(self, max_bytes: int = MAX_RECEIVE_BYTES, timeout: float = None) -> list:
+        """
+        Receive every packet that is already waiting (blocking for at least one), acknowledging each of them.
+
+        Args:
+            max_bytes (int): Maximum number of data bytes to keep from each packet.
+            timeout (float): Seconds to wait for a packet before raising socket.timeout, instead of the socket timeout.
+
+        Returns:
+            list: (sender address, received objects) pairs, one per packet, in arrival order.
+        """
+        if self._pending_packets:
+            # Packets that arrived while waiting for ACKs come first, without waiting for the socket
+            datagrams = list(self._pending_packets)
+            self._pending_packets.clear()
+        else:
+            datagrams = self._recv_batch(timeout=timeout)
+        return [(sender_address, self._process_packet(received_data, sender_address, max_bytes))
+                for sender_address, received_data in datagrams]
+
+    def _recv_batch(self, count: int = RECEIVE_BATCH, timeout: float = None) -> list:
+        """
+        Receive up to count datagrams, using a single recvmmsg(2) call where it is available.
+
+        Args:
+            count (int): Maximum number of datagrams to receive.
+            timeout (float): Seconds to wait for the first datagram, instead of the socket timeout.
+
+        Returns:
+            list: (sender address, datagram) pairs. The datagrams are views into reused buffers,
+            valid only until the next call.
+        """
+        if _libc is None:
+            if timeout is not None and not select.select([self.socket], [], [], timeout)[0]:
+                raise socket.timeout("timed out")
+            received_bytes, sender_address = self.socket.recvfrom_into(self._receive_buffer)
+            return [(sender_address, self._receive_view[:received_bytes])]
+
+        if self._recv_headers is None or len(self._recv_headers) < count:
+            # Allocate the receive buffers once and point a message header at each of them
+            self._recv_buffers = [bytearray(MAX_RECEIVE_BYTES) for _ in range(count)]
+            self._recv_views = [memoryview(buffer) for buffer in self._recv_buffers]
+            self._recv_addresses = (_SockAddrIn * count)()
+            self._recv_iovecs = (_IoVec * count)(*[_IoVec(ctypes.addressof((ctypes.c_char * len(buffer)).from_buffer(buffer)),
+                                                          len(buffer)) for buffer in self._recv_buffers])
+            self._recv_headers = (_MMsgHdr * count)()
+            for i in range(count):
+                self._recv_headers[i].msg_hdr.msg_name = ctypes.addressof(self._recv_addresses[i])
+                self._recv_headers[i].msg_hdr.msg_iov = ctypes.addressof(self._recv_iovecs[i])
+                self._recv_headers[i].msg_hdr.msg_iovlen = 1
+
+        for i in range(count):
+            self._recv_headers[i].msg_hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+
+        # Block for the first datagram only (MSG_WAITFORONE), then take whatever else is already queued; with a
+        # timeout of its own, never block in the call (even on a blocking socket) and wait in select below instead
+        flags = _MSG_WAITFORONE if timeout is None else _MSG_WAITFORONE | socket.MSG_DONTWAIT
+        while True:
+            received = _libc.recvmmsg(self.socket.fileno(), ctypes.addressof(self._recv_headers), count, flags, None)
+            if received >= 0:
+                break
+            error = ctypes.get_errno()
+            if error == errno.EINTR:
+                continue
+            if error not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise OSError(error, os.strerror(error))
+            # Nothing is queued (the socket is non-blocking while a timeout is set); wait for a datagram within that timeout
+            if not select.select([self.socket], [], [], self.socket.gettimeout() if timeout is None else timeout)[0]:
+                raise socket.timeout("timed out")
+
+        datagrams = []
+        for i in range(received):
+            address = self._recv_addresses[i]
+            sender_address = (socket.inet_ntoa(bytes(address.sin_addr)), socket.ntohs(address.sin_port))
+            datagrams.append((sender_address, self._recv_views[i][:self._recv_headers[i].msg_len]))
+        return datagrams
+
+    def _process_packet(self, received_data, sender_address, max_bytes: int) -> dict[int, bytes]:
+        """
+        Parse a received packet, acknowledge it and return the in-order data it carried.
 
-        # Deserialize the packet header
-        header = PacketHeader.deserialize(received_data[:self.header_size])
+        Args:
+            received_data: The received packet, in a writable buffer that is reused for the acknowledgment.
+            sender_address: Address the packet came from.
+            max_bytes (int): Maximum number of data bytes to keep from the packet.
+
+        Returns:
+            dict[int, bytes]: Received data, keyed by stream ID.
+        """
+        # Read the packet header fields straight from the buffer
+        packet_type, packet_number = PacketHeader.HEADER_STRUCT.unpack_from(received_data, 0)
+        frame_size, unpack_frame = self.frame_size, Frame.FRAME_STRUCT.unpack_from  # Locals for the frame loop below
         pointer = self.header_size
         received_objects = {}
         total_object_bytes = 0
 
-        if header.type == SHORT_PACKET:
+        if packet_type == SHORT_PACKET:
             self.received_packets += 1
-            ack_payload = b""
+            ack_fields = []  # Fields of every ACK frame, flattened in wire order
+
+            # Look up the stream progress of this peer (a single dict probe per packet)
+            stream_bytes_received = self.stream_bytes_received.get(sender_address)
+            if stream_bytes_received is None:
+                stream_bytes_received = {}
+                self.stream_bytes_received[sender_address] = stream_bytes_received
 
             # Process each frame in the received packet
-            while len(received_data) - pointer >= self.frame_size:
-                frame = Frame.deserialize(received_data[pointer:pointer + self.frame_size])
-                pointer += self.frame_size
-
-                # Extract data for this frame
-                data = received_data[pointer:pointer + frame.length]
-                pointer += frame.length
-                total_object_bytes += frame.length
-
-                # Initialize byte count for new streams
-                if frame.streamId not in self.stream_bytes_received:
-                    self.stream_bytes_received[frame.streamId] = 0
-
-                # Check if the received data is in the expected order
-                if frame.offset == self.stream_bytes_received[frame.streamId]:
-                    frame.increase_offset(frame.length)
-                    self.stream_bytes_received[frame.streamId] += frame.length
-                else:
-                    # If out of order, set the offset to the last known good position
-                    frame.offset = self.stream_bytes_received[frame.streamId]
+            received_length = len(received_data)
+            while received_length - pointer >= frame_size:
+                # Read the frame fields straight into locals; no Frame object is needed on this path
+                stream_id, _, offset, length = unpack_frame(received_data, pointer)
+                pointer += frame_size
+
+                data_start = pointer  # The data is copied out only if it is kept (see below)
+                pointer += length
+                total_object_bytes += length
+
+                # Check if the received data is in the expected order (new streams start at 0)
+                received_offset = stream_bytes_received.get(stream_id, 0)
+                in_order = offset == received_offset
+                if in_order:
+                    received_offset += length
+                stream_bytes_received[stream_id] = received_offset
+
+                # Prepare ACK frame, acknowledging everything up to the last known good position
+                ack_fields.extend((stream_id, ACK_FRAME, received_offset, 0))
+
+                # Store received data if it is in order and within size limit (out of order data is resent);
+                # it is copied out here, since the packet may live in a reused buffer that the ACK overwrites
+                if in_order and total_object_bytes <= max_bytes:
+                    received_objects[stream_id] = bytes(received_data[data_start:pointer])
+
+            # Serialize the whole acknowledgment with a single struct call, in place over the received packet
+            # (its data was already copied out, and the ACK is never longer than the packet it acknowledges)
+            ack_struct = self._ack_structs.get(len(ack_fields))
+            if ack_struct is None:
+                ack_struct = struct.Struct(PacketHeader.HEADER_FORMAT + Frame.FRAME_FORMAT.lstrip("!") * (len(ack_fields) // 4))
+                self._ack_structs[len(ack_fields)] = ack_struct
+            ack_struct.pack_into(received_data, 0, ACK_FRAME, packet_number, *ack_fields)
+            self.sent_packets += 1
+            self.socket.sendto(received_data[:ack_struct.size], sender_address)
 
-                # Prepare ACK frame
-                frame.length = 0
-                frame.type = ACK_FRAME
-                ack_payload += frame.serialize()
+        return received_objects
 
-                # Store received data if within size limit
-                if total_object_bytes <= max_bytes:
-                    received_objects[frame.streamId] = data
+    def close(self):
+        self.socket.close()
 
-            # Send acknowledgment back to the sender
-            ack_header = PacketHeader(ACK_FRAME, header.number)
-            self.sent_packets += 1
-            self.socket.sendto(ack_header.serialize() + ack_payload, sender_address)
 
-        return sender_address, received_objects
+class AsyncMyQUIC:
+    """
+    An asyncio front end for MyQUIC.
+
+    The protocol itself keeps running on the blocking socket; every call is handed to a worker thread,
+    so the event loop (and the rest of the application) keeps making progress while packets are sent,
+    received and acknowledged. MyQUIC's buffers and socket state belong to one operation at a time, so
+    the worker threads take turns: a receive waits for packets RECEIVE_POLL seconds at a time, letting a
+    send that was started meanwhile run in between, and a cancelled receive stops within one such wait.
+    """
+    def __init__(self):
+        self.quic = MyQUIC()
+        self._lock = asyncio.Lock()  # Serializes the calls handed to worker threads
+        self._received = deque()  # Received packets not yet returned (e.g. taken by a receive that was cancelled)
+
+    def bind(self, server_address):
+        self.quic.bind(server_address)
+
+    async def _run(self, function, *args):
+        """
+        Run a blocking MyQUIC call in a worker thread, once no other call is running.
+
+        Args:
+            function: The MyQUIC method to call.
+            *args: Arguments for the call.
+
+        Returns:
+            The result of the call.
+        """
+        async with self._lock:
+            call = asyncio.ensure_future(asyncio.to_thread(function, *args))
+            try:
+                return await asyncio.shield(call)
+            except asyncio.CancelledError:
+                # The worker thread can't be stopped; keep the lock until it is done with the socket (for a
+                # receive, within RECEIVE_POLL seconds)
+                await asyncio.wait({call})
+                raise
+
+    async def send_data(self, address, data_dict: dict[int, bytes]) -> int:
+        """
+        Send data to the specified address using the MyQUIC protocol.
+        """
+        return await self._run(self.quic.send_data, address, data_dict)
+
+    async def receive_data_batch(self, max_bytes: int = MAX_RECEIVE_BYTES) -> list:
+        """
+        Receive every packet that is already waiting (waiting for at least one), acknowledging each of them.
+
+        Returns:
+            list: (sender address, received objects) pairs, one per packet, in arrival order.
+        """
+        while not self._received:
+            await self._run(self._receive_some, max_bytes)
+        return [self._received.popleft() for _ in range(len(self._received))]
+
+    def _receive_some(self, max_bytes: int):
+        """
+        Wait up to RECEIVE_POLL seconds for packets and keep what arrives (already acknowledged) until it is returned.
+
+        Args:
+            max_bytes (int): Maximum number of data bytes to keep from each packet.
+        """
+        try:
+            self._received.extend(self.quic.receive_data_batch(max_bytes, RECEIVE_POLL))
+        except socket.timeout:
+            pass
+
+    async def receive(self, max_bytes: int = MAX_RECEIVE_BYTES):
+        """
+        Iterate over received packets as they arrive.
+
+        Yields:
+            tuple: (sender address, received objects) for each packet.
+        """
+        while True:
+            for packet in await self.receive_data_batch(max_bytes):
+                yield packet
 
     def close(self):
-        self.socket.close()
+        self.quic.close()
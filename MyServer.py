@@ -1,9 +1,12 @@
 import random
+import re
 import MyQUIC
 
+REQUEST_PAIR = re.compile(rb"(\d+)->(\d+)")  # One "stream_id->file_index" pair of a request
+
 
 def create_random_files(size_bytes):
-    return bytes(random.getrandbits(8) for _ in range(size_bytes))
+    return random.randbytes(size_bytes)  # Filled in C, rather than one Python-level getrandbits call per byte
 
 
 def main():
@@ -35,15 +38,15 @@ def main():
         request_stream_id = 18  # Define the stream ID used for requests, format
         if request_stream_id in data:
             print("Client request details:")
-            request_str = data[request_stream_id].decode()
-            stream_file_pairs = request_str.split()      # Split the request into stream-file pairs
+            # Find every stream-file pair of the request in one pass over the raw bytes
+            stream_file_pairs = REQUEST_PAIR.findall(data[request_stream_id])
 
             response_data = {}
             total_request_size = 0
 
             # Process each request pair and prepare the response data
-            for pair in stream_file_pairs:
-                stream_id, file_index = map(int, pair.split('->'))     # Splitting the string "stream_id->file_index"
+            for stream_id, file_index in stream_file_pairs:
+                stream_id, file_index = int(stream_id), int(file_index)
                 response_data[stream_id] = random_files[file_index]
                 total_request_size += len(response_data[stream_id])         # Update the total size of the response
                 print(f"Stream: {stream_id+1}, file: {file_index+1}, Actual size: {file_sizes[file_index]} bytes")
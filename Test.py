@@ -1,8 +1,13 @@
+import asyncio
+import random
+import socket
 import threading
 import unittest
-from time import sleep
+from collections import deque
+from time import monotonic, sleep
+from unittest import mock
 
-from MyQUIC import MyQUIC
+from MyQUIC import AsyncMyQUIC, MyQUIC
 
 TEST_COUNTER = 4
 
@@ -24,6 +29,57 @@ def myquic_echo_server():
 
     server_sock.close()
 
+def drop_datagrams(quic, rng, rate):
+    """
+    Make a MyQUIC instance lose a share of the datagrams it receives (data packets or ACKs), as a lossy network would.
+    The rest are handed over one at a time, so ACKs are processed in between sends rather than all at once.
+    """
+    receive_batch = quic._recv_batch
+    queued = deque()
+
+    def lossy_receive_batch(*args, **kwargs):
+        while not queued:
+            # Copy what is kept, since the received datagrams live in buffers reused by the next receive
+            queued.extend((address, bytearray(datagram)) for address, datagram in receive_batch(*args, **kwargs)
+                          if rng.random() >= rate)
+        return [queued.popleft()]
+
+    quic._recv_batch = lossy_receive_batch
+
+def open_receiver(test, port):
+    """
+    Create a MyQUIC receiver bound to a local port and closed when the test ends. Its receives time out, so a stalled
+    transfer fails the test instead of hanging it.
+    """
+    receiver = MyQUIC()
+    receiver.bind(('localhost', port))
+    receiver.socket.settimeout(10)
+    test.addCleanup(receiver.close)
+    return receiver
+
+def receive_all(receiver, data_to_send):
+    """
+    Receive until every stream of data_to_send has arrived in full, and return the data received on each stream.
+    """
+    received_data = {i: bytearray() for i in data_to_send}
+    while any(len(received_data[i]) < len(data_to_send[i]) for i in data_to_send):
+        for _, received in receiver.receive_data_batch(65536):
+            for stream_id, data in received.items():
+                received_data[stream_id] += data
+    return received_data
+
+def receive_until_done(receiver, sender_thread, timeout=10):
+    """
+    Keep receiving (and acknowledging, e.g. packets resent after a lost ACK) until the sender thread is done,
+    or for at most timeout seconds.
+    """
+    deadline = monotonic() + timeout
+    while sender_thread.is_alive() and monotonic() < deadline:
+        try:
+            receiver.receive_data_batch(65536, 0.5)
+        except socket.timeout:
+            pass
+
 class TestMyQUIC(unittest.TestCase):
     """
     This class contains tests for the MyQUIC class.
@@ -76,5 +132,145 @@ class TestMyQUIC(unittest.TestCase):
         bytes_sent = self.client_sock.send_data(self.server_address, data_to_send)
         self.assertEqual(bytes_sent, 0)
 
+
+class TestMultiPacketTransfer(unittest.TestCase):
+    """
+    This class tests a transfer that spans many packets, each carrying frames of several streams.
+    """
+
+    def test_send_many_streams(self):
+        # Test that 8 streams of several packets each arrive complete and in order
+        receiver = open_receiver(self, 1213)
+        sender = MyQUIC()
+        self.addCleanup(sender.close)
+        data_to_send = {i: bytes([i]) * (5000 + 1000 * i) for i in range(8)}
+        sender_thread = threading.Thread(target=sender.send_data, args=(('localhost', 1213), data_to_send), daemon=True)
+        sender_thread.start()
+
+        received_data = receive_all(receiver, data_to_send)
+        sender_thread.join(10)
+        self.assertFalse(sender_thread.is_alive())
+        self.assertEqual(received_data, data_to_send)
+
+
+class TestRepeatedTransfer(unittest.TestCase):
+    """
+    This class tests that sending on the same stream to the same peer more than once completes, whatever the
+    receiver makes of the later payloads.
+    """
+
+    def setUp(self):
+        self.receiver = open_receiver(self, 1220)
+        self.sender = MyQUIC()
+        self.addCleanup(self.sender.close)
+
+    def transfer_twice(self, first, second):
+        # Send both payloads on stream 1 and return the results of the send_data calls that returned
+        results = []
+
+        def send_both():
+            results.append(self.sender.send_data(('localhost', 1220), {1: first}))
+            results.append(self.sender.send_data(('localhost', 1220), {1: second}))
+
+        sender_thread = threading.Thread(target=send_both, daemon=True)
+        sender_thread.start()
+        receive_until_done(self.receiver, sender_thread)
+        self.assertFalse(sender_thread.is_alive())
+        return results
+
+    def test_send_longer_on_same_stream(self):
+        # Test that a longer second payload neither crashes nor hangs the sender (5003 is prime, so the receiver's
+        # progress on the stream falls off the frame boundaries of the second transfer)
+        self.assertEqual(len(self.transfer_twice(bytes(5003), bytes(range(256)) * 40)), 2)
+
+    def test_send_shorter_on_same_stream(self):
+        # Test that a shorter second payload neither crashes nor hangs the sender
+        self.assertEqual(len(self.transfer_twice(bytes(5003), bytes(range(256)) * 10)), 2)
+
+class TestAsyncMyQUIC(unittest.TestCase):
+    """
+    This class tests the asyncio front end of MyQUIC.
+    """
+
+    def test_overlapping_sends(self):
+        # Test that two sends awaited together on one instance both arrive complete (they take turns on the socket)
+        receiver = open_receiver(self, 1221)
+        sender = AsyncMyQUIC()
+        self.addCleanup(sender.close)
+        data_to_send = {1: bytes([1]) * 30000, 2: bytes([2]) * 40000}
+        received_data = {}
+        receiver_thread = threading.Thread(target=lambda: received_data.update(receive_all(receiver, data_to_send)), daemon=True)
+        receiver_thread.start()
+
+        async def send_both():
+            return await asyncio.wait_for(asyncio.gather(sender.send_data(('localhost', 1221), {1: data_to_send[1]}),
+                                                         sender.send_data(('localhost', 1221), {2: data_to_send[2]})), 10)
+
+        asyncio.run(send_both())
+        receiver_thread.join(10)
+        self.assertEqual(received_data, data_to_send)
+
+    def test_cancel_receive(self):
+        # Test that a receive waiting on an idle socket can be cancelled (here by a timeout)
+        quic = AsyncMyQUIC()
+        quic.bind(('localhost', 1222))
+        self.addCleanup(quic.close)
+
+        async def receive_briefly():
+            started = monotonic()
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(quic.receive_data_batch(65536), 0.3)
+            return monotonic() - started
+
+        self.assertLess(asyncio.run(receive_briefly()), 2)
+
+    def test_send_while_receiving(self):
+        # Test that a send completes while a receive on the same instance is still waiting for packets
+        receiver = open_receiver(self, 1223)
+        quic = AsyncMyQUIC()
+        quic.bind(('localhost', 1224))
+        self.addCleanup(quic.close)
+        data_to_send = {1: bytes([1]) * 30000}
+        received_data = {}
+        receiver_thread = threading.Thread(target=lambda: received_data.update(receive_all(receiver, data_to_send)), daemon=True)
+        receiver_thread.start()
+
+        async def send_while_receiving():
+            receiving = asyncio.ensure_future(quic.receive_data_batch(65536))
+            await asyncio.sleep(0.05)  # Let the receive start waiting first
+            await asyncio.wait_for(quic.send_data(('localhost', 1223), data_to_send), 10)
+            self.assertFalse(receiving.done())
+            receiving.cancel()
+
+        asyncio.run(send_while_receiving())
+        receiver_thread.join(10)
+        self.assertEqual(received_data, data_to_send)
+
+class TestLossyTransfer(unittest.TestCase):
+    """
+    This class tests that lost packets and ACKs are resent until every stream arrives complete.
+    """
+
+    @mock.patch('MyQUIC.ACK_TIMEOUT', 0.1)  # Keep the timeouts of lost packets short
+    def test_send_with_loss(self):
+        # Test several transfers, each losing a fifth of its data packets and ACKs (with more streams than fit in a
+        # packet, so some streams are left out of the packets that resend lost data)
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                receiver = open_receiver(self, 1214 + seed)  # A port per transfer, each closed on cleanup
+                sender = MyQUIC()
+                self.addCleanup(sender.close)
+                drop_datagrams(receiver, random.Random(seed), 0.2)
+                drop_datagrams(sender, random.Random(seed + 100), 0.2)
+
+                data_to_send = {i: bytes([i]) * (5000 + 3000 * i) for i in range(16)}
+                sender_thread = threading.Thread(target=sender.send_data, args=(('localhost', 1214 + seed), data_to_send), daemon=True)
+                sender_thread.start()
+
+                received_data = receive_all(receiver, data_to_send)
+                receive_until_done(receiver, sender_thread)  # Resent packets still need ACKs if theirs were lost
+                self.assertFalse(sender_thread.is_alive())
+                self.assertEqual(received_data, data_to_send)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file